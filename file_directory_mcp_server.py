@@ -4,11 +4,148 @@ Simple MCP Server for File Management
 This server provides tools to list and read files in a directory.
 """
 
+import ctypes
 import json
+import mmap
+import platform
+import re
+import stat
+import struct
 import sys
 import os
-from pathlib import Path
-from typing import Dict, Any, List
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# orjson is optional; its JSONDecodeError subclasses json.JSONDecodeError
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# getdents64 syscall numbers for 64-bit userlands, used for the Linux
+# directory listing fast path
+_SYS_GETDENTS64 = {
+    "x86_64": 217,
+    "aarch64": 61,
+    "riscv64": 61,
+}
+_GETDENTS_BUFSIZE = 1 << 20
+# struct linux_dirent64 header: d_ino, d_off, d_reclen, d_type (name follows)
+_DIRENT64 = struct.Struct("=QqHB")
+_DT_DIR = 4
+_DT_REG = 8
+# Batches of at least this many files are stat'd from a thread pool
+_PARALLEL_STAT_THRESHOLD = 256
+_STAT_WORKERS = 32
+_STAT_CHUNK = 64
+# Files at least this large are read through mmap
+_MMAP_THRESHOLD = 64 * 1024
+# Number of directory fds kept open for reuse between listings
+_DIR_FD_CACHE_SIZE = 32
+# Largest Content-Length framed request body accepted
+_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+# A "Name:" header line, which starts a Content-Length framed message
+_HEADER_LINE = re.compile(rb"[A-Za-z][A-Za-z0-9-]*:")
+
+
+def _load_getdents64():
+    """Return (syscall number, libc syscall function) or None if unsupported"""
+    if not sys.platform.startswith("linux"):
+        return None
+    # platform.machine() reports the kernel, which may run a 32-bit
+    # interpreter with a different syscall table
+    if ctypes.sizeof(ctypes.c_void_p) != 8:
+        return None
+    number = _SYS_GETDENTS64.get(platform.machine())
+    if number is None:
+        return None
+    try:
+        syscall = ctypes.CDLL(None, use_errno=True).syscall
+    except (OSError, AttributeError):
+        return None
+    syscall.restype = ctypes.c_long
+    syscall.argtypes = (ctypes.c_long, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t)
+    return number, syscall
+
+
+_GETDENTS64 = _load_getdents64()
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. surrogate-escaped filenames, which json can escape
+    return json.dumps(obj).encode()
+
+
+def _loads(data) -> Any:
+    """Parse JSON, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. escaped lone surrogates, which json accepts
+    return json.loads(data)
+
+
+def _getdents64(fd: int) -> Iterator[Tuple[str, int]]:
+    """Yield (name, d_type) for every entry of an open directory.
+
+    Reads entries with a 1MB buffer per syscall instead of the ~32KB libc
+    readdir uses, which matters for directories with huge entry counts.
+    """
+    number, syscall = _GETDENTS64
+    buf = ctypes.create_string_buffer(_GETDENTS_BUFSIZE)
+    header = _DIRENT64.size
+    while True:
+        nread = syscall(number, fd, buf, _GETDENTS_BUFSIZE)
+        if nread < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if nread == 0:
+            return
+        data = ctypes.string_at(buf, nread)
+        pos = 0
+        while pos < nread:
+            _, _, reclen, d_type = _DIRENT64.unpack_from(data, pos)
+            name = data[pos + header:data.index(b"\0", pos + header, pos + reclen)]
+            if name != b"." and name != b"..":
+                yield os.fsdecode(name), d_type
+            pos += reclen
+
+
+def _sizes_at(names: List[str], dir_fd: int) -> Dict[str, int]:
+    """Return {name: size} for files inside an already open directory.
+    
+    Each name is stat'd relative to dir_fd, so the directory path isn't
+    resolved again per file. Files that can no longer be stat'd (e.g.
+    removed since the directory was read) are left out. Long name lists are
+    spread over a thread pool: os.stat releases the GIL, so on network
+    filesystems the per-file round trips overlap.
+    """
+    def sizes(chunk: List[str]) -> List[Tuple[str, int]]:
+        result = []
+        for name in chunk:
+            try:
+                result.append((name, os.stat(name, dir_fd=dir_fd).st_size))
+            except OSError:
+                continue
+        return result
+    
+    if len(names) < _PARALLEL_STAT_THRESHOLD:
+        return dict(sizes(names))
+    
+    chunks = [names[i:i + _STAT_CHUNK] for i in range(0, len(names), _STAT_CHUNK)]
+    result = {}
+    with ThreadPoolExecutor(max_workers=min(_STAT_WORKERS, len(chunks))) as executor:
+        for chunk_sizes in executor.map(sizes, chunks):
+            result.update(chunk_sizes)
+    return result
+
 
 class MCPServer:
     def __init__(self):
@@ -43,6 +180,24 @@ class MCPServer:
             }
         }
         
+        # These results never change, so build them once up front
+        self._init_result = {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {
+                "tools": {}
+            },
+            "serverInfo": {
+                "name": "file-manager-server",
+                "version": "1.0.0"
+            }
+        }
+        self._tools_list_result = {
+            "tools": list(self.tools.values())
+        }
+        
+        # Open directory fds keyed by (st_dev, st_ino), least recently used first
+        self._dir_fds = OrderedDict()
+        
     def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle incoming MCP requests"""
         method = request.get("method")
@@ -54,25 +209,14 @@ class MCPServer:
                 return {
                     "jsonrpc": "2.0",
                     "id": request_id,
-                    "result": {
-                        "protocolVersion": "2024-11-05",
-                        "capabilities": {
-                            "tools": {}
-                        },
-                        "serverInfo": {
-                            "name": "file-manager-server",
-                            "version": "1.0.0"
-                        }
-                    }
+                    "result": self._init_result
                 }
             
             elif method == "tools/list":
                 return {
                     "jsonrpc": "2.0",
                     "id": request_id,
-                    "result": {
-                        "tools": list(self.tools.values())
-                    }
+                    "result": self._tools_list_result
                 }
             
             elif method == "tools/call":
@@ -119,48 +263,168 @@ class MCPServer:
                 }
             }
     
+    def handle_batch(self, requests: List[Any]) -> Any:
+        """Handle a JSON-RPC batch, returning one response per request"""
+        if not requests:
+            return self._invalid_request("Invalid Request: empty batch")
+        
+        responses = []
+        for request in requests:
+            if isinstance(request, dict):
+                responses.append(self.handle_request(request))
+            else:
+                responses.append(self._invalid_request())
+        return responses
+    
+    def _invalid_request(self, message: str = "Invalid Request") -> Dict[str, Any]:
+        """Error response for a message that is not a JSON-RPC request object"""
+        return {
+            "jsonrpc": "2.0",
+            "id": None,
+            "error": {
+                "code": -32600,
+                "message": message
+            }
+        }
+    
     def _list_files(self, path: str) -> str:
         """List files in a directory"""
         try:
-            path_obj = Path(path)
-            if not path_obj.exists():
+            try:
+                st = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
                 return f"Error: Path '{path}' does not exist"
             
-            if not path_obj.is_dir():
+            if not stat.S_ISDIR(st.st_mode):
                 return f"Error: Path '{path}' is not a directory"
             
-            files = []
-            for item in path_obj.iterdir():
-                if item.is_file():
-                    files.append(f"📄 {item.name} ({item.stat().st_size} bytes)")
-                elif item.is_dir():
-                    files.append(f"📁 {item.name}/")
+            # Entries are (name, is_dir, size) tuples
+            if _GETDENTS64 is not None:
+                entries = self._list_files_fast(path, st)
+            else:
+                # scandir caches the entry type from the directory read, so
+                # only regular files need an extra stat() for their size.
+                # Directories are checked first and need nothing further.
+                entries = []
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            entries.append((entry.name, True, 0))
+                        elif entry.is_file():
+                            entries.append((entry.name, False, entry.stat().st_size))
             
-            if not files:
+            if not entries:
                 return f"Directory '{path}' is empty"
             
-            return f"Contents of '{path}':\n" + "\n".join(sorted(files))
+            # Directories first, then files, each sorted by name
+            entries.sort(key=lambda e: (not e[1], e[0]))
+            return f"Contents of '{path}':\n" + "\n".join(
+                f"📁 {name}/" if is_dir else f"📄 {name} ({size} bytes)"
+                for name, is_dir, size in entries
+            )
             
         except Exception as e:
             return f"Error listing files: {str(e)}"
     
+    def _list_files_fast(self, path: str, st: os.stat_result) -> List[Tuple[str, bool, int]]:
+        """List a directory with raw getdents64 reads (Linux only)"""
+        entries = []
+        regular = []
+        fd = self._open_dir(path, st)
+        for name, d_type in _getdents64(fd):
+            if d_type == _DT_DIR:
+                entries.append((name, True, 0))
+            elif d_type == _DT_REG:
+                regular.append(name)
+            else:
+                # Symlinks and unknown types need a stat to find out what
+                # they point to
+                try:
+                    entry_st = os.stat(name, dir_fd=fd)
+                except OSError:
+                    continue  # dangling symlink
+                if stat.S_ISREG(entry_st.st_mode):
+                    entries.append((name, False, entry_st.st_size))
+                elif stat.S_ISDIR(entry_st.st_mode):
+                    entries.append((name, True, 0))
+        
+        # Sizes for regular files are looked up once the whole directory
+        # has been read
+        for name, size in _sizes_at(regular, fd).items():
+            entries.append((name, False, size))
+        
+        return entries
+    
+    def _open_dir(self, path: str, st: os.stat_result) -> int:
+        """Return an fd for a directory, reusing one from an earlier listing.
+        
+        Fds are cached by device and inode rather than by path, so a path
+        that now names a different directory never gets a stale fd. Access
+        is re-checked before reuse, as opening the directory again would.
+        """
+        key = (st.st_dev, st.st_ino)
+        fd = self._dir_fds.pop(key, None)
+        if fd is not None and not os.access(path, os.R_OK):
+            os.close(fd)  # no longer readable; let os.open report the error
+            fd = None
+        
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+            if len(self._dir_fds) >= _DIR_FD_CACHE_SIZE:
+                _, oldest = self._dir_fds.popitem(last=False)
+                os.close(oldest)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)  # rewind for a fresh read
+        
+        self._dir_fds[key] = fd
+        return fd
+    
+    def close(self):
+        """Close the directory fds kept open between listings"""
+        while self._dir_fds:
+            _, fd = self._dir_fds.popitem()
+            os.close(fd)
+    
     def _read_file(self, path: str) -> str:
         """Read contents of a file"""
         try:
-            path_obj = Path(path)
-            if not path_obj.exists():
+            try:
+                st = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
                 return f"Error: File '{path}' does not exist"
             
-            if not path_obj.is_file():
+            if not stat.S_ISREG(st.st_mode):
                 return f"Error: '{path}' is not a file"
             
             # Limit file size for safety
-            if path_obj.stat().st_size > 1024 * 1024:  # 1MB limit
+            size = st.st_size
+            if size > 1024 * 1024:  # 1MB limit
                 return f"Error: File '{path}' is too large (max 1MB)"
             
-            with open(path_obj, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # Read straight into a preallocated buffer and decode it once
+            buf = bytearray(size)
+            with open(path, 'rb') as f:
+                if size >= _MMAP_THRESHOLD:
+                    # Copy large files straight out of the mapped page cache
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        buf[:] = mm
+                else:
+                    nread = f.readinto(buf)
+                    del buf[nread:]
+                    buf += f.read()  # files whose size grew or isn't reported
             
+            # A NUL byte near the start means a binary file; catch that
+            # cheaply instead of attempting to decode the whole buffer
+            if buf.find(b"\0", 0, 4096) != -1:
+                return f"Error: Cannot read '{path}' - appears to be a binary file"
+            
+            content = buf.decode('utf-8')
+            # Same newline translation as reading in text mode
+            if "\r" in content:
+                content = content.replace("\r\n", "\n").replace("\r", "\n")
+            
+            # The path stays a str: it may hold surrogate escapes from
+            # os.fsdecode that can't be encoded as UTF-8
             return f"Contents of '{path}':\n\n{content}"
             
         except UnicodeDecodeError:
@@ -168,33 +432,118 @@ class MCPServer:
         except Exception as e:
             return f"Error reading file: {str(e)}"
     
+    def _read_message(self, stdin) -> Tuple[Optional[bytes], bool, Optional[str]]:
+        """Read the next message body from stdin.
+        
+        Returns (body, framed, error), with body None at end of input.
+        Messages are either newline-delimited JSON or, like LSP, a block of
+        headers including Content-Length and a blank line followed by exactly
+        that many bytes of JSON. error describes a framed message whose
+        headers are unusable; its body has been skipped where possible.
+        """
+        while True:
+            line = stdin.readline()
+            if not line:
+                return None, False, None
+            
+            # JSON never starts with "Name:", so this begins a header block
+            if _HEADER_LINE.match(line):
+                return self._read_framed_message(stdin, line)
+            
+            line = line.strip()
+            if line:
+                return line, False, None
+    
+    def _read_framed_message(self, stdin, line: bytes) -> Tuple[bytes, bool, Optional[str]]:
+        """Read the rest of a header block starting at line, then its body"""
+        length = None
+        while line.strip():
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    length = -1
+            line = stdin.readline()
+        
+        if length is None or length < 0:
+            return b"", True, "missing or invalid Content-Length"
+        
+        if length > _MAX_MESSAGE_SIZE:
+            # Skip the body so the next message is read from the right place
+            remaining = length
+            while remaining:
+                chunk = stdin.read(min(remaining, 1 << 16))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            return b"", True, f"message too large (max {_MAX_MESSAGE_SIZE} bytes)"
+        
+        return stdin.read(length), True, None
+    
+    def _parse_error(self, message: str) -> Dict[str, Any]:
+        """Error response for a message that could not be parsed"""
+        return {
+            "jsonrpc": "2.0",
+            "id": None,
+            "error": {
+                "code": -32700,
+                "message": f"Parse error: {message}"
+            }
+        }
+    
+    def _send(self, response: Any, framed: bool = False):
+        """Write a response to stdout as a single write, framed like the request"""
+        try:
+            payload = _dumps(response)
+        except (TypeError, ValueError) as e:
+            # An unencodable result must not take the server down
+            payload = _dumps({
+                "jsonrpc": "2.0",
+                "id": response.get("id") if isinstance(response, dict) else None,
+                "error": {
+                    "code": -32603,
+                    "message": f"Internal error: {str(e)}"
+                }
+            })
+        if framed:
+            payload = b"Content-Length: %d\r\n\r\n" % len(payload) + payload
+        else:
+            payload += b"\n"
+        sys.stdout.buffer.write(payload)
+        sys.stdout.buffer.flush()
+    
     def run(self):
         """Run the MCP server"""
         print("🚀 MCP File Manager Server started!", file=sys.stderr)
         print("💡 Send JSON-RPC requests via stdin", file=sys.stderr)
         
-        for line in sys.stdin:
-            line = line.strip()
-            if not line:
+        # Read raw bytes; the JSON parser decodes UTF-8 itself
+        stdin = sys.stdin.buffer
+        while True:
+            body, framed, error = self._read_message(stdin)
+            if body is None:
+                break
+            
+            if error is not None:
+                self._send(self._parse_error(error), framed)
                 continue
                 
             try:
-                request = json.loads(line)
-                response = self.handle_request(request)
-                print(json.dumps(response))
-                sys.stdout.flush()
-            except json.JSONDecodeError as e:
-                error_response = {
-                    "jsonrpc": "2.0",
-                    "id": None,
-                    "error": {
-                        "code": -32700,
-                        "message": f"Parse error: {str(e)}"
-                    }
-                }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
+                request = _loads(body)
+                if isinstance(request, list):
+                    response = self.handle_batch(request)
+                elif isinstance(request, dict):
+                    response = self.handle_request(request)
+                else:
+                    response = self._invalid_request()
+                self._send(response, framed)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                self._send(self._parse_error(str(e)), framed)
 
 if __name__ == "__main__":
     server = MCPServer()
-    server.run()
\ No newline at end of file
+    try:
+        server.run()
+    finally:
+        server.close()
\ No newline at end of file
@@ -4,41 +4,76 @@ Simple MCP Client
 This client connects to MCP servers and provides a simple interface to interact with them.
 """
 
+import copy
+import glob
 import json
+import os
+import select
 import subprocess
 import sys
-import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+# orjson is optional and only used to speed up JSON encoding/decoding
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. surrogate-escaped filenames, which json can escape
+    return json.dumps(obj).encode()
+
+
+def _loads(data) -> Any:
+    """Parse JSON, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. escaped lone surrogates, which json accepts
+    return json.loads(data)
+
 
 class MCPClient:
-    def __init__(self, server_command: str):
+    def __init__(self, server_command: Optional[str] = None, timeout: float = 5.0,
+                 server: Optional[Any] = None):
         self.server_command = server_command
+        # How long to wait for a freshly started server's first response
+        self.timeout = timeout
+        # An MCPServer instance to call directly instead of a subprocess
+        self.server = server
         self.process = None
+        self.awaiting_startup = False
         self.request_id = 1
         
     def start_server(self):
         """Start the MCP server process"""
+        if self.server is not None:
+            return True  # in-process server, nothing to start
+        
         try:
             self.process = subprocess.Popen(
                 self.server_command.split(),
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=0
+                bufsize=65536
             )
+            self.awaiting_startup = True
             print("✅ MCP Server started successfully!")
-            time.sleep(0.5)  # Give server time to start
             return True
         except Exception as e:
             print(f"❌ Failed to start server: {e}")
             return False
     
-    def send_request(self, method: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Send a JSON-RPC request to the server"""
-        if not self.process:
-            raise RuntimeError("Server not started")
-        
+    def _make_request(self, method: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Build a JSON-RPC request with the next request id"""
         request = {
             "jsonrpc": "2.0",
             "id": self.request_id,
@@ -49,18 +84,92 @@ class MCPClient:
             request["params"] = params
         
         self.request_id += 1
+        return request
+    
+    def send_request(self, method: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Send a JSON-RPC request to the server"""
+        return self._exchange(self._make_request(method, params))
+    
+    def send_batch(self, calls: List[Tuple[str, Optional[Dict]]]) -> List[Dict[str, Any]]:
+        """Send (method, params) pairs as one JSON-RPC batch.
+        
+        Returns the responses in the same order as the calls.
+        """
+        if not calls:
+            return []
+        
+        requests = [self._make_request(method, params) for method, params in calls]
+        responses = self._exchange(requests)
+        if isinstance(responses, dict):  # the batch as a whole was rejected
+            raise RuntimeError(responses.get("error", {}).get("message", "Batch request failed"))
+        
+        by_id = {response.get("id"): response for response in responses}
+        missing = {"error": {"message": "No response for request"}}
+        return [by_id.get(request["id"], missing) for request in requests]
+    
+    def _exchange(self, message: Any) -> Any:
+        """Send one message to the server and return the decoded response"""
+        if self.server is not None:
+            # Same interpreter: skip the pipe and JSON round trip entirely.
+            # Responses can share the server's cached results, so hand back
+            # a copy the caller is free to modify.
+            if isinstance(message, list):
+                return copy.deepcopy(self.server.handle_batch(message))
+            return copy.deepcopy(self.server.handle_request(message))
         
-        # Send request
-        request_json = json.dumps(request) + "\n"
-        self.process.stdin.write(request_json)
+        if not self.process:
+            raise RuntimeError("Server not started")
+        
+        # Send request, framed with a Content-Length header so the server
+        # can read the body in one go
+        body = _dumps(message)
+        self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
         self.process.stdin.flush()
         
-        # Read response
-        response_line = self.process.stdout.readline()
-        if not response_line:
+        # The first response is bounded by self.timeout so a server that
+        # never comes up is detected; after that, slow tool calls (large or
+        # network directories) are simply waited for
+        if self.awaiting_startup:
+            self._wait_for_startup()
+            self.awaiting_startup = False
+        return _loads(self._read_message())
+    
+    def _read_message(self) -> bytes:
+        """Read one Content-Length framed message body from the server"""
+        stdout = self.process.stdout
+        length = None
+        while True:
+            line = stdout.readline()
+            if not line:
+                raise RuntimeError("No response from server")
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        
+        if length is None or length < 0:
+            raise RuntimeError("Server response has no valid Content-Length")
+        
+        body = stdout.read(length)
+        if len(body) < length:
             raise RuntimeError("No response from server")
+        return body
+    
+    def _wait_for_startup(self):
+        """Wait until a new server has output to read, up to self.timeout"""
+        if os.name == "nt":
+            return  # select() does not support pipes on Windows
         
-        return json.loads(response_line.strip())
+        ready, _, _ = select.select([self.process.stdout], [], [], self.timeout)
+        if not ready:
+            # A late reply would be read as the answer to the next request,
+            # so a server that missed startup isn't used any more
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+            raise RuntimeError(f"No response from server within {self.timeout}s")
     
     def initialize(self) -> bool:
         """Initialize the MCP connection"""
@@ -105,18 +214,33 @@ class MCPClient:
                 "name": tool_name,
                 "arguments": arguments
             })
-            
-            if "result" in response:
-                content = response["result"]["content"]
-                if content and len(content) > 0:
-                    return content[0]["text"]
-                return "No content returned"
-            else:
-                return f"Error: {response.get('error', {}).get('message', 'Unknown error')}"
+            return self._tool_result_text(response)
                 
         except Exception as e:
             return f"Error calling tool: {e}"
     
+    def call_tools_batch(self, calls: List[Tuple[str, Dict]]) -> List[str]:
+        """Call several tools in a single round trip to the server"""
+        try:
+            responses = self.send_batch([
+                ("tools/call", {"name": tool_name, "arguments": arguments})
+                for tool_name, arguments in calls
+            ])
+            return [self._tool_result_text(response) for response in responses]
+            
+        except Exception as e:
+            return [f"Error calling tool: {e}"] * len(calls)
+    
+    def _tool_result_text(self, response: Dict[str, Any]) -> str:
+        """Extract the text of a tools/call response"""
+        if "result" in response:
+            content = response["result"]["content"]
+            if content and len(content) > 0:
+                return content[0]["text"]
+            return "No content returned"
+        else:
+            return f"Error: {response.get('error', {}).get('message', 'Unknown error')}"
+    
     def stop_server(self):
         """Stop the MCP server"""
         if self.process:
@@ -130,10 +254,17 @@ class MCPClient:
         print("Commands:")
         print("  list - Show available tools")
         print("  ls <path> - List files in directory")
-        print("  cat <file> - Read file contents")
+        print("  cat <file> - Read file contents (globs like *.py read several)")
         print("  quit - Exit")
         print("-" * 40)
         
+        handlers = {
+            "list": self._cmd_list,
+            "ls": self._cmd_ls,
+            "cat": self._cmd_cat,
+            "quit": self._cmd_quit,
+        }
+        
         while True:
             try:
                 command = input("\nmcp> ").strip()
@@ -141,40 +272,55 @@ class MCPClient:
                 if not command:
                     continue
                 
-                if command == "quit":
+                name, _, arg = command.partition(" ")
+                if handlers.get(name, self._cmd_unknown)(arg.strip()):
                     break
-                
-                elif command == "list":
-                    tools = self.list_tools()
-                    print("\n📋 Available Tools:")
-                    for tool in tools:
-                        print(f"  • {tool['name']}: {tool['description']}")
-                
-                elif command.startswith("ls "):
-                    path = command[3:].strip() or "."
-                    result = self.call_tool("list_files", {"path": path})
-                    print(f"\n{result}")
-                
-                elif command.startswith("cat "):
-                    filepath = command[4:].strip()
-                    if not filepath:
-                        print("❌ Please provide a file path")
-                        continue
-                    result = self.call_tool("read_file", {"path": filepath})
-                    print(f"\n{result}")
-                
-                elif command == "ls":
-                    result = self.call_tool("list_files", {"path": "."})
-                    print(f"\n{result}")
-                
-                else:
-                    print("❌ Unknown command. Type 'quit' to exit.")
                     
             except KeyboardInterrupt:
                 print("\n👋 Goodbye!")
                 break
             except Exception as e:
                 print(f"❌ Error: {e}")
+    
+    def _cmd_list(self, arg: str):
+        """Show available tools"""
+        tools = self.list_tools()
+        print("\n📋 Available Tools:")
+        for tool in tools:
+            print(f"  • {tool['name']}: {tool['description']}")
+    
+    def _cmd_ls(self, arg: str):
+        """List files in a directory"""
+        result = self.call_tool("list_files", {"path": arg or "."})
+        print(f"\n{result}")
+    
+    def _cmd_cat(self, arg: str):
+        """Read file contents"""
+        if not arg:
+            print("❌ Please provide a file path")
+            return
+        
+        # Globs are read with one batched request
+        is_glob = any(char in arg for char in "*?[")
+        matches = sorted(glob.glob(arg)) if is_glob else []
+        if matches:
+            results = self.call_tools_batch([
+                ("read_file", {"path": match}) for match in matches
+            ])
+            for result in results:
+                print(f"\n{result}")
+            return
+        
+        result = self.call_tool("read_file", {"path": arg})
+        print(f"\n{result}")
+    
+    def _cmd_quit(self, arg: str) -> bool:
+        """Exit the session"""
+        return True
+    
+    def _cmd_unknown(self, arg: str):
+        """Report an unrecognised command"""
+        print("❌ Unknown command. Type 'quit' to exit.")
 
 def main():
     # You can change this to point to your server script